@@ -14,6 +14,7 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import r2_score, mean_squared_error
 from sklearn.preprocessing import StandardScaler
 import warnings
+from trip_store import TripStore
 warnings.filterwarnings('ignore')
 
 # Set academic style
@@ -50,8 +51,9 @@ DOPAMINE_COLORS = {
 class AcademicVisualizerEnglish:
     """Academic Style Visualization Generator (English)"""
     
-    def __init__(self, data_path):
+    def __init__(self, data_path, store_dir=None):
         self.data_path = data_path
+        self.store_dir = store_dir
         self.df = None
         self.features = None
         self.target = None
@@ -60,7 +62,10 @@ class AcademicVisualizerEnglish:
     def load_and_prepare_data(self):
         """Load and prepare data"""
         print("Loading data...")
-        self.df = pd.read_csv(self.data_path)
+        if self.store_dir:
+            self.df = TripStore.open_or_build(self.data_path, self.store_dir).to_frame()
+        else:
+            self.df = pd.read_csv(self.data_path)
         
         # Basic feature engineering
         self.df['start_time'] = pd.to_datetime(self.df['start_time'])
@@ -10,6 +10,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.cluster import KMeans
 import warnings
+from trip_store import TripStore
 warnings.filterwarnings('ignore')
 
 # Set academic style
@@ -46,14 +47,18 @@ DOPAMINE_COLORS = {
 class Chapter4VisualizerEnglish:
     """Chapter 4 Visualization Generator (English)"""
     
-    def __init__(self, data_path):
+    def __init__(self, data_path, store_dir=None):
         self.data_path = data_path
+        self.store_dir = store_dir
         self.df = None
         
     def load_and_prepare_data(self):
         """Load and prepare data"""
         print("Loading data...")
-        self.df = pd.read_csv(self.data_path)
+        if self.store_dir:
+            self.df = TripStore.open_or_build(self.data_path, self.store_dir).to_frame()
+        else:
+            self.df = pd.read_csv(self.data_path)
         
         # Basic feature engineering
         self.df['start_time'] = pd.to_datetime(self.df['start_time'])
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the memory-mapped columnar trip store
+"""
+
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+from trip_store import TripStore, build_trip_store, METADATA_FILE, LOCK_FILE
+
+CSV_HEADER = ('orderid,bikeid,userid,start_time,start_location_x,start_location_y,'
+              'end_time,end_location_x,end_location_y,track,house_price\n')
+CSV_ROWS = [
+    '1,11,101,2016/8/20 6:57,121.348,31.389,2016/8/20 7:04,121.357,31.388,'
+    '"121.347,31.392#121.348,31.389#121.349,31.390",68000\n',
+    '2,12,102,2016/8/29 19:09,121.508,31.279,2016/8/29 19:31,121.489,31.271,,72000\n',
+    '3,13,103,2016/8/30 8:15,121.400,31.200,2016/8/30 8:30,121.410,31.210,'
+    '"121.400,31.200",55000\n',
+]
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(CSV_HEADER)
+        f.writelines(rows)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'trips.csv'
+    write_csv(path, CSV_ROWS)
+    return str(path)
+
+
+@pytest.fixture
+def store(csv_path, tmp_path):
+    return TripStore.open_or_build(csv_path, str(tmp_path / 'store'))
+
+
+def test_column_projection_and_row_range(store):
+    prices = store.column('house_price', rows=(1, 3))
+    assert isinstance(prices, np.memmap)
+    assert not prices.flags.writeable
+    assert prices.tolist() == [72000, 55000]
+
+    data = store.read(['orderid', 'start_time'], rows=slice(0, 2))
+    assert list(data) == ['orderid', 'start_time']
+    assert data['orderid'].tolist() == [1, 2]
+    assert data['start_time'][0] == np.datetime64('2016-08-20T06:57')
+    assert 'track' not in store.columns
+
+
+def test_unknown_column(store):
+    with pytest.raises(KeyError):
+        store.column('track')
+
+
+def test_tracks_csr(store):
+    offsets, points = store.tracks()
+    assert offsets.tolist() == [0, 3, 3, 4]
+    assert points.shape == (4, 2)
+    assert not points.flags.writeable
+
+    offsets, points = store.tracks(rows=(1, 3))
+    assert offsets.tolist() == [0, 0, 1]
+    assert points.tolist() == [[121.400, 31.200]]
+
+    assert store.track(0).tolist() == [[121.347, 31.392], [121.348, 31.389], [121.349, 31.390]]
+    assert store.track(1).shape == (0, 2)
+
+
+def test_track_negative_and_out_of_range(store):
+    assert store.track(-1).tolist() == [[121.400, 31.200]]
+    with pytest.raises(IndexError, match='out of range'):
+        store.track(len(store))
+    with pytest.raises(IndexError, match='out of range'):
+        store.track(-len(store) - 1)
+
+
+def test_empty_row_range(store):
+    offsets, points = store.tracks(rows=(2, 1))
+    assert offsets.tolist() == [0]
+    assert points.shape == (0, 2)
+    assert len(store.column('orderid', rows=(2, 1))) == 0
+    assert len(store.to_frame(rows=(2, 1))) == 0
+
+
+def test_reopen_without_rebuild(csv_path, store):
+    reopened = TripStore.open_or_build(csv_path, store.store_dir)
+    assert reopened.metadata['build'] == store.metadata['build']
+
+
+def test_rebuild_after_csv_change(csv_path, store):
+    old_offsets, old_points = store.tracks()
+    write_csv(csv_path, CSV_ROWS[:2])
+    os.utime(csv_path, ns=(0, 0))
+    assert not TripStore.is_current(csv_path, store.store_dir)
+
+    rebuilt = TripStore.open_or_build(csv_path, store.store_dir)
+    assert len(rebuilt) == 2
+    assert rebuilt.column('orderid').tolist() == [1, 2]
+    assert rebuilt.build_dir != store.build_dir
+
+    # Mappings of the previous build stay readable after the swap
+    assert old_offsets.tolist() == [0, 3, 3, 4]
+    assert old_points[-1].tolist() == [121.400, 31.200]
+    assert store.column('house_price').tolist() == [68000, 72000, 55000]
+    assert store.track(2).tolist() == [[121.400, 31.200]]
+    assert len([n for n in os.listdir(store.store_dir) if n.startswith('build-')]) == 1
+
+
+def test_invalid_metadata_is_not_current(csv_path, store):
+    with open(os.path.join(store.store_dir, METADATA_FILE), 'w', encoding='utf-8') as f:
+        f.write('{"version": ')
+    assert not TripStore.is_current(csv_path, store.store_dir)
+    assert len(TripStore.open_or_build(csv_path, store.store_dir)) == 3
+
+
+def test_column_names_do_not_collide(tmp_path):
+    path = tmp_path / 'odd.csv'
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('track_offsets,a/b,track\n1,2,"0.5,1.5"\n')
+    built = build_trip_store(str(path), str(tmp_path / 'store'))
+    assert built.column('track_offsets').tolist() == [1]
+    assert built.column('a/b').tolist() == [2]
+    assert built.track(0).tolist() == [[0.5, 1.5]]
+
+
+def test_other_csv_is_not_current(csv_path, store, tmp_path):
+    other = tmp_path / 'other.csv'
+    write_csv(other, CSV_ROWS)
+    os.utime(other, ns=(os.stat(csv_path).st_atime_ns, os.stat(csv_path).st_mtime_ns))
+    assert not TripStore.is_current(str(other), store.store_dir)
+
+
+def test_failed_build_leaves_no_build_dir(tmp_path):
+    path = tmp_path / 'bad.csv'
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('orderid,name\n1,abc\n')
+    store_dir = tmp_path / 'store'
+    for _ in range(2):
+        with pytest.raises(ValueError, match='not numeric'):
+            TripStore.open_or_build(str(path), str(store_dir))
+    assert not [n for n in os.listdir(store_dir) if n.startswith('build-')]
+
+
+def test_lock_released_when_builder_dies(csv_path, tmp_path):
+    store_dir = tmp_path / 'store'
+    os.makedirs(store_dir)
+    # Take the build lock in a child process and kill it without cleanup
+    code = ('import os, sys; from trip_store import _build_lock\n'
+            'with _build_lock(sys.argv[1]):\n'
+            '    os._exit(0)\n')
+    subprocess.run([sys.executable, '-c', code, str(store_dir)], check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert os.path.exists(store_dir / LOCK_FILE)
+    assert len(TripStore.open_or_build(csv_path, str(store_dir))) == 3
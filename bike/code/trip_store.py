@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory-Mapped Columnar Trip Store
+Build the trip CSV once into per-column .npy files and reopen them as zero-copy views
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import contextlib
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+STORE_VERSION = 2
+METADATA_FILE = 'metadata.json'
+LOCK_FILE = '.build.lock'
+TRACK_OFFSETS_FILE = 'track_offsets.npy'
+TRACK_POINTS_FILE = 'track_points.npy'
+LOCK_TIMEOUT_SECONDS = 600
+OPEN_RETRIES = 5
+
+# Columns parsed as timestamps and stored as datetime64[ns]
+TIME_COLUMNS = ['start_time', 'end_time']
+TRACK_COLUMN = 'track'
+
+
+def _source_signature(csv_path):
+    """Size and modification time used to detect a stale store"""
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_metadata(store_dir):
+    """Load the metadata header, or None if it is missing, unreadable or invalid"""
+    try:
+        with open(os.path.join(store_dir, METADATA_FILE), encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(metadata, dict) or metadata.get('version') != STORE_VERSION:
+        return None
+    if not os.path.isdir(os.path.join(store_dir, metadata.get('build', ''))):
+        return None
+    return metadata
+
+
+def _try_lock(fd):
+    """Take a non-blocking exclusive lock that the OS drops if the process dies"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _write_atomic(path, write):
+    """Write a file through a temp file in the same directory, then swap it into place"""
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@contextlib.contextmanager
+def _build_lock(store_dir, timeout=LOCK_TIMEOUT_SECONDS):
+    """Serialise builds across processes with an OS file lock on a shared lock file"""
+    lock_path = os.path.join(store_dir, LOCK_FILE)
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+    try:
+        deadline = time.monotonic() + timeout
+        while not _try_lock(fd):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for trip store lock: {lock_path}")
+            time.sleep(0.1)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def _sweep_builds(store_dir, keep):
+    """Remove build directories other than keep (lock held)"""
+    for name in os.listdir(store_dir):
+        if name.startswith('build-') and name != keep:
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+
+
+def _parse_tracks(track_series):
+    """Convert 'x,y#x,y#...' strings into CSR offsets and an (n, 2) points array"""
+    lengths = np.zeros(len(track_series), dtype=np.int64)
+    chunks = []
+    for i, track in enumerate(track_series):
+        if not isinstance(track, str) or not track:
+            continue
+        points = np.array([p.split(',') for p in track.split('#')], dtype=np.float64)
+        lengths[i] = len(points)
+        chunks.append(points)
+
+    offsets = np.zeros(len(track_series) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    points = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.float64)
+    return offsets, points
+
+
+def _write_build(csv_path, build_dir):
+    """Parse the CSV into .npy files in build_dir and return the metadata for them"""
+    df = pd.read_csv(csv_path)
+    columns = {}
+    for index, column in enumerate(df.columns):
+        if column == TRACK_COLUMN:
+            continue
+        if column in TIME_COLUMNS:
+            values = pd.to_datetime(df[column]).to_numpy(dtype='datetime64[ns]')
+        else:
+            values = df[column].to_numpy()
+        if values.dtype == object:
+            raise ValueError(f"Column '{column}' is not numeric and cannot be memory-mapped")
+        filename = f'col_{index}.npy'
+        np.save(os.path.join(build_dir, filename), values)
+        columns[column] = {'file': filename, 'dtype': values.dtype.str}
+
+    has_tracks = TRACK_COLUMN in df.columns
+    if has_tracks:
+        offsets, points = _parse_tracks(df[TRACK_COLUMN])
+        np.save(os.path.join(build_dir, TRACK_OFFSETS_FILE), offsets)
+        np.save(os.path.join(build_dir, TRACK_POINTS_FILE), points)
+
+    return {
+        'version': STORE_VERSION,
+        'build': os.path.basename(build_dir),
+        'num_rows': len(df),
+        'columns': columns,
+        'has_tracks': has_tracks,
+        'source': os.path.abspath(csv_path),
+        'source_signature': _source_signature(csv_path),
+    }
+
+
+def _build(csv_path, store_dir):
+    """Write a fresh build directory and point the metadata header at it (lock held)"""
+    print(f"Building trip store in {store_dir}...")
+
+    # Every build goes into its own directory so open mappings keep their files
+    build = f'build-{uuid.uuid4().hex}'
+    build_dir = os.path.join(store_dir, build)
+    os.makedirs(build_dir)
+    try:
+        metadata = _write_build(csv_path, build_dir)
+
+        def write_metadata(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, indent=2)
+
+        _write_atomic(os.path.join(store_dir, METADATA_FILE), write_metadata)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    # Open stores map all their files up front, so unlinking old builds is safe
+    _sweep_builds(store_dir, keep=build)
+
+    print(f"Trip store built successfully, {metadata['num_rows']} records")
+    return TripStore(store_dir)
+
+
+def build_trip_store(csv_path, store_dir):
+    """Parse the trip CSV and write one .npy file per column plus CSR track arrays"""
+    os.makedirs(store_dir, exist_ok=True)
+    with _build_lock(store_dir):
+        return _build(csv_path, store_dir)
+
+
+class TripStore:
+    """Read-only view over a memory-mapped columnar trip store"""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        # A concurrent rebuild may sweep the build between reading metadata and mapping it
+        for _ in range(OPEN_RETRIES):
+            self.metadata = _read_metadata(store_dir)
+            if self.metadata is None:
+                raise ValueError(f"No valid trip store in {store_dir}")
+            self.build_dir = os.path.join(store_dir, self.metadata['build'])
+            try:
+                self._arrays = self._map_all()
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            raise RuntimeError(f"Trip store in {store_dir} kept changing while opening")
+        self.num_rows = self.metadata['num_rows']
+        self.columns = list(self.metadata['columns'])
+
+    @classmethod
+    def open_or_build(cls, csv_path, store_dir):
+        """Open the store in store_dir, rebuilding it if missing or older than the CSV"""
+        if cls.is_current(csv_path, store_dir):
+            return cls(store_dir)
+        os.makedirs(store_dir, exist_ok=True)
+        with _build_lock(store_dir):
+            # Another worker may have finished the build while we waited
+            if cls.is_current(csv_path, store_dir):
+                return cls(store_dir)
+            return _build(csv_path, store_dir)
+
+    @staticmethod
+    def is_current(csv_path, store_dir):
+        """Check that store_dir holds a complete store built from the current CSV"""
+        metadata = _read_metadata(store_dir)
+        return (metadata is not None and
+                metadata.get('source') == os.path.abspath(csv_path) and
+                metadata.get('source_signature') == _source_signature(csv_path))
+
+    def __len__(self):
+        return self.num_rows
+
+    def _map_all(self):
+        """Memory-map every file of the build up front so later sweeps cannot remove them"""
+        filenames = [info['file'] for info in self.metadata['columns'].values()]
+        if self.metadata['has_tracks']:
+            filenames += [TRACK_OFFSETS_FILE, TRACK_POINTS_FILE]
+        return {name: np.load(os.path.join(self.build_dir, name), mmap_mode='r')
+                for name in filenames}
+
+    def _row_slice(self, rows):
+        """Normalize a (start, stop) pair or slice into a contiguous slice"""
+        if rows is None:
+            return slice(0, self.num_rows)
+        if not isinstance(rows, slice):
+            rows = slice(*rows)
+        start, stop, step = rows.indices(self.num_rows)
+        if step != 1:
+            raise ValueError("Row ranges must be contiguous")
+        return slice(start, max(stop, start))
+
+    def column(self, name, rows=None):
+        """Zero-copy read-only view of one column over a row range"""
+        if name not in self.metadata['columns']:
+            raise KeyError(f"Unknown column: {name}")
+        return self._arrays[self.metadata['columns'][name]['file']][self._row_slice(rows)]
+
+    def read(self, columns=None, rows=None):
+        """Dict of zero-copy column views, projected to columns and a row range"""
+        columns = self.columns if columns is None else columns
+        return {name: self.column(name, rows) for name in columns}
+
+    def tracks(self, rows=None):
+        """CSR track arrays for a row range: (offsets relative to points, points view)"""
+        if not self.metadata['has_tracks']:
+            raise KeyError("Trip store has no track data")
+        rows = self._row_slice(rows)
+        offsets = self._arrays[TRACK_OFFSETS_FILE][rows.start:rows.stop + 1]
+        points = self._arrays[TRACK_POINTS_FILE][offsets[0]:offsets[-1]]
+        return offsets - offsets[0], points
+
+    def track(self, row):
+        """Zero-copy (n, 2) view of the track points for a single trip"""
+        if row < 0:
+            row += self.num_rows
+        if not 0 <= row < self.num_rows:
+            raise IndexError(f"Row {row} out of range for trip store with {self.num_rows} rows")
+        offsets, points = self.tracks((row, row + 1))
+        return points[offsets[0]:offsets[1]]
+
+    def to_frame(self, columns=None, rows=None):
+        """Build a DataFrame from the projected columns
+
+        Unlike pd.read_csv, the frame has no 'track' column (use tracks() instead) and
+        start_time/end_time are already datetime64. pandas copies the data, so only
+        column(), read() and tracks() share the memory-mapped pages.
+        """
+        rows = self._row_slice(rows)
+        data = self.read(columns, rows)
+        return pd.DataFrame(data, index=pd.RangeIndex(rows.start, rows.stop))